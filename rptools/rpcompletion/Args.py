@@ -3,6 +3,7 @@ from argparse import ArgumentParser
 default_upper_flux_bound = 10000
 default_lower_flux_bound = -default_upper_flux_bound
 default_max_subpaths_filter = 10
+default_nb_workers = 1
 
 def add_arguments(parser: ArgumentParser) -> ArgumentParser:
     parser.add_argument(
@@ -52,6 +53,11 @@ def add_arguments(parser: ArgumentParser) -> ArgumentParser:
         type=int,
         default=default_max_subpaths_filter,
         help=f'Define the topX pathways to keep (default: {default_max_subpaths_filter}, 0 = no filtering)')
+    parser.add_argument(
+        '--nb_workers',
+        type=int,
+        default=default_nb_workers,
+        help=f'Number of processes used to complete chemical transformations (default: {default_nb_workers})')
     # parser.add_argument('--pathway_id', type=str, default='rp_pathway')
     # parser.add_argument('--compartment_id', type=str, default='MNXC3')
     # parser.add_argument('--species_group_id', type=str, default='rp_trunk_species')
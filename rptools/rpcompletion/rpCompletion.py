@@ -1,8 +1,33 @@
-from csv import reader as csv_reader
-from itertools import product as itertools_product
-from io import StringIO
-import pandas as pd
+from itertools import (
+    chain,
+    product as itertools_product
+)
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_start_method
+from pickle import (
+    dumps as pickle_dumps,
+    PicklingError
+)
+from pyarrow import (
+    ArrowInvalid,
+    BufferReader,
+    Table,
+    array as pa_array,
+    memory_map,
+    int64 as pa_int64,
+    string as pa_string
+)
+from pyarrow.csv import (
+    read_csv as pa_read_csv,
+    open_csv as pa_open_csv,
+    ParseOptions,
+    ConvertOptions
+)
+import pyarrow.compute as pc
 from typing import (
+    FrozenSet,
     List,
     Dict,
     Tuple
@@ -11,7 +36,6 @@ from logging import (
     Logger,
     getLogger
 )
-from copy import deepcopy
 from brs_utils import (
     insert_and_or_replace_in_sorted_list,
     Item,
@@ -27,9 +51,16 @@ from rptools.rplibs import (
 from .Args import (
     default_upper_flux_bound,
     default_lower_flux_bound,
-    default_max_subpaths_filter
+    default_max_subpaths_filter,
+    default_nb_workers
 )
 
+# Sides of a chemical reaction
+__SIDES = ('right', 'left')
+# Brackets around and spaces within EC numbers cell
+__EC_STRIP_PATTERN = r'^.|.$| '
+
+
 def rp_completion(
     rp2_metnet,
     sink,
@@ -39,6 +70,7 @@ def rp_completion(
     upper_flux_bound: float = default_upper_flux_bound,
     lower_flux_bound: float = default_lower_flux_bound,
     max_subpaths_filter: int = default_max_subpaths_filter,
+    nb_workers: int = default_nb_workers,
     logger: Logger = getLogger(__name__)
 ) -> List[rpPathway]:
     """Process to the completion of metabolic pathways 
@@ -87,6 +119,9 @@ def rp_completion(
     max_subpaths_filter: int, optional
         Number of pathways (best) kept per master pathway
         (default: 10)
+    nb_workers: int, optional
+        Number of processes used to complete chemical
+        transformations (default: 1)
     logger: Logger, optional
 
     Returns
@@ -104,6 +139,9 @@ def rp_completion(
             ]
         )
 
+    # Compounds may have changed since a previous run
+    __get_smiles.cache_clear()
+
     ## READ
     __rp2paths_compounds_in_cache(
         infile=rp2paths_compounds,
@@ -128,6 +166,7 @@ def rp_completion(
         transfos=transfos,
         ec_numbers=ec_numbers,
         cache=cache,
+        nb_workers=nb_workers,
         logger=logger
     )
 
@@ -162,6 +201,7 @@ def __complete_transformations(
     transfos: Dict,
     ec_numbers: Dict,
     cache: rrCache,
+    nb_workers: int = default_nb_workers,
     logger: Logger = getLogger(__name__)
 ) -> Dict:
     """From template reactions, put back chemical species
@@ -178,6 +218,9 @@ def __complete_transformations(
         as inforamtion)
     cache: rrCache
         Cache that contains reaction rules data
+    nb_workers: int, optional
+        Number of processes to rebuild reactions with
+        (default: 1)
     logger: Logger, optional
 
     Returns
@@ -189,6 +232,8 @@ def __complete_transformations(
     logger.debug(f'ec_numbers: {ec_numbers}')
 
     full_transfos = {}
+    # (transfo_id, rule_id, transfo_smi) to rebuild
+    tasks = []
 
     # For each transformation
     for transfo_id, transfo in transfos.items():
@@ -208,23 +253,105 @@ def __complete_transformations(
 
         # MULTIPLE RR FOR ONE TRANSFO
         for rule_id in transfo['rule_ids']:
-
-            # MULTIPLE TEMPLATE REACTIONS FOR ONE RR
-            # If 'tmpl_rxn_id' is not given,
-            # the transformation will be completed
-            # for each template reaction from reaction rule was built from
-            full_transfos[transfo_id]['complement'][rule_id] = rebuild_rxn(
-                cache=cache,
-                rxn_rule_id=rule_id,
-                transfo=transfo_smi,
-                direction='forward',
-                # tmpl_rxn_id=tmpl_rxn_id,
-                logger=logger
+            tasks.append((transfo_id, rule_id, transfo_smi))
+
+    # MULTIPLE TEMPLATE REACTIONS FOR ONE RR
+    # The transformation is completed for each template
+    # reaction the reaction rule was built from
+    complements = None
+    if nb_workers > 1:
+        # Forked workers inherit the cache, otherwise it is
+        # pickled once per worker: check it can be before
+        # starting the pool (not when forking, the probe
+        # would copy the whole cache for nothing)
+        try:
+            if get_start_method() != 'fork':
+                pickle_dumps((cache, logger))
+        except (PicklingError, TypeError, AttributeError) as e:
+            logger.warning(
+                f'Could not send the cache to worker processes ({e}), '
+                'switching to serial mode'
             )
+        else:
+            # Errors raised while rebuilding reactions
+            # within workers are propagated
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=nb_workers,
+                    initializer=__init_rebuild_worker,
+                    initargs=(cache, logger)
+                ) as executor:
+                    complements = list(
+                        executor.map(__rebuild_transfo, tasks, chunksize=16)
+                    )
+            except BrokenProcessPool as e:
+                logger.warning(
+                    f'Worker processes terminated abruptly ({e}), '
+                    'switching to serial mode'
+                )
+    if complements is None:
+        __init_rebuild_worker(cache, logger)
+        try:
+            complements = [__rebuild_transfo(task) for task in tasks]
+        finally:
+            # Do not keep a reference to the cache
+            __init_rebuild_worker(None)
+
+    for (transfo_id, rule_id, _), complement in zip(tasks, complements):
+        full_transfos[transfo_id]['complement'][rule_id] = complement
 
     return full_transfos
 
 
+# Reaction rules cache used by __rebuild_transfo,
+# set once per process by __init_rebuild_worker
+__rebuild_cache = None
+__rebuild_logger = getLogger(__name__)
+
+
+def __init_rebuild_worker(
+    cache: rrCache,
+    logger: Logger = getLogger(__name__)
+) -> None:
+    """Set data used by __rebuild_transfo
+    within the current process
+
+    Parameters
+    ----------
+    cache: rrCache
+        Cache that contains reaction rules data
+    logger: Logger, optional
+    """
+    global __rebuild_cache, __rebuild_logger
+    __rebuild_cache = cache
+    __rebuild_logger = logger
+
+
+def __rebuild_transfo(task: Tuple[str, str, str]) -> Dict:
+    """Complete a chemical transformation from
+    the template reactions of a reaction rule
+
+    Parameters
+    ----------
+    task: Tuple[str, str, str]
+        Transformation ID, reaction rule ID
+        and transformation SMILES
+
+    Returns
+    -------
+    Completed transformation for each template reaction
+    """
+    transfo_id, rule_id, transfo_smi = task
+    return rebuild_rxn(
+        cache=__rebuild_cache,
+        rxn_rule_id=rule_id,
+        transfo=transfo_smi,
+        direction='forward',
+        # tmpl_rxn_id=tmpl_rxn_id,
+        logger=__rebuild_logger
+    )
+
+
 def __build_smiles(
     side: Dict,
     logger: Logger = getLogger(__name__)
@@ -242,43 +369,81 @@ def __build_smiles(
     -------
     SMILES string
     """
-    return '.'.join([Cache.get(spe_id).get_smiles() for spe_id in side.keys()])
+    return '.'.join(__get_smiles(spe_id) for spe_id in side)
+
+
+@lru_cache(maxsize=None)
+def __get_smiles(spe_id: str) -> str:
+    """Get SMILES string of a chemical species
+    stored in the cache. Results are memoized since
+    many transformations share the same species.
+
+    Parameters
+    ----------
+    spe_id: str
+        ID of the chemical species
+
+    Returns
+    -------
+    SMILES string
+    """
+    return Cache.get(spe_id).get_smiles()
 
-def __build_reader(
+
+def __read_table(
     path: str,
     delimiter: str = ',',
     logger: Logger=getLogger(__name__)
-) -> 'csv_reader':
-    """Build a CSV reader object
+) -> Table:
+    """Read a CSV file into an Arrow table.
+    All columns are read as strings.
 
     Parameters
     ----------
     path: str
-        Path to the file to build the reader from
+        Path to the file to read (or file content as bytes)
     delimiter: str, optional
         Pattern to separate columns
     logger: Logger, optional
 
     Returns
     -------
-    CSV reader object
+    Arrow table, None if the file cannot be read or parsed
     """
-    if isinstance(path, bytes):
-        reader = csv_reader(
-            StringIO(path.decode('utf-8')),
-            delimiter=delimiter
-        )
-    else:
-        try:
-            reader = csv_reader(
-                open(path, 'r'),
-                delimiter=delimiter
+    parse_options = ParseOptions(delimiter=delimiter)
+
+    def read(buffer):
+        # Get columns names from the header
+        # to prevent type inference on IDs
+        with pa_open_csv(
+            BufferReader(buffer),
+            parse_options=parse_options
+        ) as reader:
+            names = reader.schema.names
+        return pa_read_csv(
+            BufferReader(buffer),
+            parse_options=parse_options,
+            convert_options=ConvertOptions(
+                column_types={name: pa_string() for name in names}
             )
-        except FileNotFoundError:
-            logger.error('Could not read file: '+str(path))
-            return None
-    next(reader)
-    return reader
+        )
+
+    try:
+        if isinstance(path, bytes):
+            return read(path)
+        # Map the file once, header and content are both
+        # read from it. The parsed table owns its memory,
+        # the file can be closed right after.
+        with memory_map(path) as source:
+            return read(source.read_buffer())
+    except FileNotFoundError:
+        logger.error('Could not read file: '+str(path))
+        return None
+    except ArrowInvalid as e:
+        # e.g. empty file or rows with a wrong number of columns
+        logger.error('Could not parse file: '+str(path))
+        logger.error(str(e))
+        return None
 
 
 def __rp2paths_compounds_in_cache(
@@ -299,17 +464,18 @@ def __rp2paths_compounds_in_cache(
     """
 
     try:
-        reader = __build_reader(
+        table = __read_table(
             path=infile,
             delimiter='\t',
             logger=logger
         )
-        if reader is None:
-            logger.error(f'File not found: {infile}')
+        if table is None:
+            logger.error(f'No data read from {infile}')
             return None
-        for row in reader:
-            spe_id = row[0]
-            smiles = row[1]
+        for spe_id, smiles in zip(
+            table.column(0).to_pylist(),
+            table.column(1).to_pylist()
+        ):
             cmpd = __get_compound_from_cache(
                 spe_id=spe_id,
                 smiles=smiles,
@@ -329,6 +495,9 @@ def __rp2paths_compounds_in_cache(
     except TypeError as e:
         logger.error('Could not read the compounds file ('+str(infile)+')')
         raise RuntimeError
+    finally:
+        # Release the cache held by memoized conversions
+        __convert_smiles.cache_clear()
 
 
 def __get_compound_from_cache(
@@ -356,49 +525,63 @@ def __get_compound_from_cache(
     informations ('inchi', 'inchikey',
     'name', 'formula')
     """
-    try:
-        inchi = cache.get('cid_strc')[spe_id]['inchi']
-    except KeyError:
+    entry = cache.get('cid_strc').get(spe_id, {})
+
+    inchi = entry.get('inchi', '')
+    if 'inchi' not in entry and smiles:
         # try to generate them yourself by converting them directly
         try:
-            resConv = cache._convert_depiction(
-                idepic=smiles,
-                itype='smiles',
-                otype={'inchi'}
-            )
-            inchi = resConv['inchi']
+            inchi = __convert_smiles(cache, smiles, 'inchi')
         except NotImplementedError as e:
             logger.warning('Could not convert the following SMILES to InChI: '+str(smiles))
-    try:
-        inchikey = cache.get('cid_strc')[spe_id]['inchikey']
+
+    inchikey = entry.get('inchikey', '')
     # try to generate them yourself by converting them directly
     # TODO: consider using the inchi writing instead of the SMILES notation to find the inchikey
-    except KeyError:
+    if 'inchikey' not in entry and smiles:
         try:
-            resConv = cache._convert_depiction(
-                idepic=smiles,
-                itype='smiles',
-                otype={'inchikey'}
-            )
-            inchikey = resConv['inchikey']
+            inchikey = __convert_smiles(cache, smiles, 'inchikey')
         except NotImplementedError as e:
             logger.warning('Could not convert the following SMILES to InChI key: '+str(smiles))
-    try:
-        name = cache.get('cid_strc')[spe_id]['name']
-    except KeyError:
-        name = ''
-    try:
-        formula = cache.get('cid_strc')[spe_id]['formula']
-    except KeyError:
-        formula = ''
 
     return {
         'inchi': inchi,
         'inchikey': inchikey,
-        'name': name,
-        'formula': formula
+        'name': entry.get('name', ''),
+        'formula': entry.get('formula', '')
     }
 
+
+@lru_cache(maxsize=None)
+def __convert_smiles(
+    cache: rrCache,
+    smiles: str,
+    otype: str
+) -> str:
+    """Convert a SMILES string into another depiction.
+    Results are memoized since the same structures
+    (water, cofactors...) are met many times.
+
+    Parameters
+    ----------
+    cache: rrCache
+        Reaction Rules cache
+    smiles: str
+        SMILES string to convert
+    otype: str
+        Type of depiction to convert to
+        ('inchi', 'inchikey')
+
+    Returns
+    -------
+    Converted depiction
+    """
+    return cache._convert_depiction(
+        idepic=smiles,
+        itype='smiles',
+        otype={otype}
+    )[otype]
+
 def __read_rp2_metnet(
     infile: str,
     logger: Logger = getLogger(__name__)
@@ -419,14 +602,23 @@ def __read_rp2_metnet(
     """
 
     ec_numbers = {}
-    reader = __build_reader(path=infile, logger=logger)
-    if reader is None:
-        logger.error(f'File not found: {infile}')
+    table = __read_table(path=infile, logger=logger)
+    if table is None:
+        logger.error(f'No data read from {infile}')
         return {}
-    for row in reader:
-        if row[1] not in ec_numbers:
-            ec_numbers[row[1]] = {
-                'ec': [i.replace(' ', '') for i in row[11][1:-1].split(',') if i.replace(' ', '')!='NOEC'],
+    # Strip brackets and spaces in one pass, then split EC numbers
+    ecs = pc.split_pattern(
+        pc.replace_substring_regex(
+            table.column(11),
+            __EC_STRIP_PATTERN,
+            ''
+        ),
+        ','
+    ).to_pylist()
+    for transfo_id, ec in zip(table.column(1).to_pylist(), ecs):
+        if transfo_id not in ec_numbers:
+            ec_numbers[transfo_id] = {
+                'ec': [i for i in ec if i != 'NOEC'],
             }
 
     logger.debug(ec_numbers)
@@ -437,7 +629,7 @@ def __read_rp2_metnet(
 def __read_sink(
     infile: str,
     logger: Logger = getLogger(__name__)
-) -> List[str]:
+) -> FrozenSet[str]:
     """Reads chemical species that are in the sink
 
     Parameters
@@ -448,20 +640,18 @@ def __read_sink(
 
     Returns
     -------
-    List of chemical species ID that are in the sink
+    Set of chemical species ID that are in the sink
     """
 
-    sink_molecules = set()
-    reader = __build_reader(path=infile, logger=logger)
-    if reader is None:
-        logger.error(f'File not found: {infile}')
-        return []
-    for row in reader:
-        sink_molecules.add(row[0])
+    table = __read_table(path=infile, logger=logger)
+    if table is None:
+        logger.error(f'No data read from {infile}')
+        return frozenset()
+    sink_molecules = frozenset(table.column(0).to_pylist())
 
     logger.debug(list(sink_molecules))
 
-    return list(sink_molecules)
+    return sink_molecules
 
 
 def __read_pathways(
@@ -483,59 +673,105 @@ def __read_pathways(
     as dictionnaries
     """
 
-    df = pd.read_csv(infile)
+    table = __read_table(path=infile, logger=logger)
+    if table is None:
+        exit(-1)
 
-    check = __check_pathways(df)
-    if not check:
+    check = __check_pathways(table)
+    if check is not True:
         logger.error(check)
-        exit()
+        exit(-1)
 
-    pathways = {}
-    transfos = {}
+    try:
+        path_ids = pc.cast(table['Path ID'], pa_int64())
+    except ArrowInvalid:
+        logger.error('\'Path ID\' column contain non integer value(s)')
+        exit(-1)
+    table = table.set_column(
+        table.schema.get_field_index('Path ID'),
+        'Path ID',
+        path_ids
+    )
 
-    for index, row in df.iterrows():
+    table = table.append_column(
+        'transfo_id',
+        pc.utf8_slice_codeunits(table['Unique ID'], 0, -2)
+    ).append_column(
+        'row',
+        pa_array(range(table.num_rows))
+    )
 
-        path_id = row['Path ID']
-        transfo_id = row['Unique ID'][:-2]
+    # Keep pathways (and transformations within) in file order
+    _pathways = table.group_by(
+        'Path ID',
+        use_threads=False
+    ).aggregate([
+        ('transfo_id', 'list'),
+        ('row', 'min')
+    ]).sort_by('row_min')
+    pathways = dict(
+        zip(
+            _pathways['Path ID'].to_pylist(),
+            _pathways['transfo_id_list'].to_pylist()
+        )
+    )
 
-        if path_id in pathways:
-            pathways[path_id] += [transfo_id]
-        else:
-            pathways[path_id] = [transfo_id]
-
-        if transfo_id not in transfos:
-            transfos[transfo_id] = {}
-            transfos[transfo_id]['rule_ids'] = row['Rule ID'].split(',')
-            for side in ['left', 'right']:
-                transfos[transfo_id][side] = {}
-                # split compounds
-                compounds = row[side[0].upper()+side[1:]].split(':')
-                # read compound and its stochio 
-                for compound in compounds:
-                    sto, spe = compound.split('.')
-                    transfos[transfo_id][side][spe] = int(sto)
+    # Only the first occurence of a transformation is read
+    first_rows = table.group_by(
+        'transfo_id',
+        use_threads=False
+    ).aggregate([('row', 'min')]).sort_by('row_min')
+    table = table.take(first_rows['row_min'])
+    rule_ids = pc.split_pattern(table['Rule ID'], ',').to_pylist()
+
+    sides = {}
+    for side in ['left', 'right']:
+        # split compounds
+        compounds = pc.split_pattern(table[side[0].upper()+side[1:]], ':')
+        # read compound and its stochio
+        sto_spe = pc.split_pattern(
+            pc.list_flatten(compounds),
+            '.',
+            max_splits=1
+        )
+        stos = pc.cast(pc.list_element(sto_spe, 0), pa_int64()).to_pylist()
+        spes = pc.list_element(sto_spe, 1).to_pylist()
+        # back to one dictionary per transformation
+        sides[side] = []
+        start = 0
+        for length in pc.list_value_length(compounds).to_pylist():
+            sides[side].append(
+                dict(zip(spes[start:start+length], stos[start:start+length]))
+            )
+            start += length
+
+    transfos = {
+        transfo_id: {
+            'rule_ids': rule_ids[idx],
+            'left': sides['left'][idx],
+            'right': sides['right'][idx]
+        }
+        for idx, transfo_id in enumerate(table['transfo_id'].to_pylist())
+    }
 
     return pathways, transfos
 
 
-def __check_pathways(df) -> bool:
-    """Checks pathways data as pandas dataframe
+def __check_pathways(table: Table) -> bool:
+    """Checks pathways data as Arrow table
 
     Parameters
     ----------
-    df: pandas.DataFrame
-        Pathways as pandas dataframe
+    table: pyarrow.Table
+        Pathways as Arrow table
 
     Returns
     -------
-    True if data are ok, False otherwise
+    True if data are ok, error message otherwise
     """
-    if len(df) == 0:
+    if table.num_rows == 0:
         return 'infile is empty'
 
-    if df['Path ID'].dtypes != 'int64':
-        return '\'Path ID\' column contain non integer value(s)'
-
     return True
 
 
@@ -581,11 +817,6 @@ def __build_pathway_combinatorics(
         for transfo_id in transfos_lst:
 
             transfo_idx += 1
-            # Compounds from original transformation
-            compounds = {
-                'right': dict(full_transfos[transfo_id]['right']),
-                'left': dict(full_transfos[transfo_id]['left'])
-            }
             # Build list of transformations
             # where each transfo can correspond to multiple reactions
             # due to multiple reaction rules and/or multiple template reactions
@@ -601,13 +832,8 @@ def __build_pathway_combinatorics(
 
                 ## ITERATE OVER TEMPLATE REACTIONS
                 # Current reaction rule generated from multiple template reactions?
-                for tmpl_rxn_ids, tmpl_rxn in tmpl_rxns.items():
-
-                    # Add template reaction compounds
-                    compounds = __add_compounds(
-                        compounds,
-                        tmpl_rxn['added_cmpds']
-                    )
+                # (reaction compounds are merged in __build_reaction_data)
+                for tmpl_rxn_ids in tmpl_rxns:
 
                     # Add the triplet ID to identify the sub_pathway
                     pathways_all_reactions[pathway][-1].append(
@@ -624,7 +850,7 @@ def __build_pathway_combinatorics(
 def __build_all_pathways(
     pathways: Dict,
     transfos: Dict,
-    sink_molecules: List,
+    sink_molecules: FrozenSet,
     rr_reactions: Dict,
     compounds_cache: Dict,
     max_subpaths_filter: int,
@@ -646,7 +872,7 @@ def __build_all_pathways(
             - template reaction ID
     transfos: Dict
         Full chemical transformations
-    sink_molecules: List
+    sink_molecules: FrozenSet
         Sink chemical species IDs
     rr_reactions: Dict
         Reaction rules cache
@@ -670,120 +896,106 @@ def __build_all_pathways(
     nb_pathways = 0
     nb_unique_pathways = 0
 
+    # Reactions data are built once per
+    # (transfo_id, rule_ids, tmpl_rxn_id) triplet
+    # and shared over all sub-pathways
+    rxns_data = {}
+
     ## PATHWAYS
     for path_idx, transfos_lst in pathways.items():
 
-        # Combine over multiple template reactions
-        sub_pathways = list(itertools_product(*transfos_lst))
+        for rxns in transfos_lst:
+            for rxn in rxns:
+                triplet = (
+                    rxn['rp2_transfo_id'],
+                    rxn['rule_ids'],
+                    rxn['tmpl_rxn_ids']
+                )
+                if triplet not in rxns_data:
+                    rxns_data[triplet] = __build_reaction_data(
+                        transfo=transfos[rxn['rp2_transfo_id']],
+                        rule_ids=rxn['rule_ids'],
+                        tmpl_rxn_id=rxn['tmpl_rxn_ids'],
+                        rr_reactions=rr_reactions,
+                        compounds_cache=compounds_cache,
+                        logger=logger
+                    )
 
         ## SUB-PATHWAYS
-        # # Keep only topX best sub_pathways
-        # # within a same master pathway
+        # Keep only topX best sub_pathways
+        # within a same master pathway
         res_pathways[path_idx] = []
-        for sub_path_idx in range(len(sub_pathways)):
+        signatures = {}
+        # Combine over multiple template reactions
+        for sub_path_idx, sub_pathway in enumerate(
+            itertools_product(*transfos_lst)
+        ):
 
             pathway = rpPathway(
-                id=str(path_idx).zfill(3)+'_'+str(sub_path_idx+1).zfill(4),
+                id=f'{path_idx:03d}_{sub_path_idx+1:04d}',
                 logger=logger
             )
             logger.debug(pathway.get_id())
 
             ## ITERATE OVER REACTIONS
-            nb_reactions = len(sub_pathways[sub_path_idx])
+            nb_reactions = len(sub_pathway)
             for rxn_idx in range(nb_reactions):
 
-                rxn = sub_pathways[sub_path_idx][rxn_idx]
-                transfo_id = rxn['rp2_transfo_id']
-                transfo = transfos[transfo_id]
-                rule_ids = rxn['rule_ids']
-                tmpl_rxn_id = rxn['tmpl_rxn_ids']
-
-                ## COMPOUNDS
-                # Template reaction compounds
-                added_cmpds = transfo['complement'][rule_ids][tmpl_rxn_id]['added_cmpds']
-                # Add missing compounds to the cache
-                for side in added_cmpds.keys():
-                    for spe_id in added_cmpds[side].keys():
-                        logger.debug(f'Add missing compound {spe_id}')
-                        if spe_id not in Cache.get_objects():
-                            try:
-                                rpCompound(
-                                    id=spe_id,
-                                    smiles=compounds_cache[spe_id]['smiles'],
-                                    inchi=compounds_cache[spe_id]['inchi'],
-                                    inchikey=compounds_cache[spe_id]['inchikey'],
-                                    formula=compounds_cache[spe_id]['formula'],
-                                    name=compounds_cache[spe_id]['name']
-                                )
-                            except KeyError:
-                                rpCompound(
-                                    id=spe_id
-                                )
+                rxn = sub_pathway[rxn_idx]
+                rxn_data = rxns_data[
+                    (
+                        rxn['rp2_transfo_id'],
+                        rxn['rule_ids'],
+                        rxn['tmpl_rxn_ids']
+                    )
+                ]
+                compounds = rxn_data['compounds']
 
                 ## REACTION
-                # Compounds from original transformation
-                core_species = {
-                    'right': deepcopy(transfo['right']),
-                    'left': deepcopy(transfo['left'])
-                }
-                compounds = __add_compounds(core_species, added_cmpds)
                 # revert reaction index (forward)
                 rxn_idx_forward = nb_reactions - rxn_idx
+                # compounds are memoized and shared by all sub-pathways
+                # using this reaction, each rpReaction gets its own copy
                 rxn = rpReaction(
-                    id='rxn_'+str(rxn_idx_forward),
-                    ec_numbers=transfo['ec'],
+                    id=f'rxn_{rxn_idx_forward}',
+                    ec_numbers=rxn_data['ec'],
                     reactants=dict(compounds['left']),
                     products=dict(compounds['right']),
                     lower_flux_bound=lower_flux_bound,
                     upper_flux_bound=upper_flux_bound
                 )
                 # write infos
-                for info_id, info in sub_pathways[sub_path_idx][rxn_idx].items():
+                for info_id, info in sub_pathway[rxn_idx].items():
                     getattr(rxn, 'set_'+info_id)(info)
-                rxn.set_rule_score(rr_reactions[rule_ids][tmpl_rxn_id]['rule_score'])
+                rxn.set_rule_score(rxn_data['rule_score'])
                 rxn.set_idx_in_path(rxn_idx_forward)
 
                 # Add at the beginning of the pathway
                 # to have the pathway in forward direction
-                # Search for the target in the current reaction
-                target_id = [spe_id for spe_id in rxn.get_products_ids() if 'TARGET' in spe_id]
-                if target_id != []:
-                    target_id = target_id[0]
-                else:
-                    target_id = None
                 logger.debug(f'rxn: {rxn._to_dict()}')
                 pathway.add_reaction(
                     rxn=rxn,
-                    target_id=target_id
+                    target_id=rxn_data['target_id']
                 )
 
                 ## TRUNK SPECIES
                 pathway.add_species_group(
                     'trunk',
-                    [
-                        spe_id
-                        for value
-                        in core_species.values()
-                        for spe_id in value.keys()
-                    ]
+                    rxn_data['trunk_species']
                 )
 
                 ## COMPLETED SPECIES
                 pathway.add_species_group(
                     'completed',
-                    [
-                        spe_id
-                        for value
-                        in added_cmpds.values()
-                        for spe_id in value.keys()
-                    ]
+                    rxn_data['completed_species']
                 )
 
             ## SINK
             pathway.set_sink_species(
-                list(
-                    set(pathway.get_species_ids()) & set(sink_molecules)
-                )
+                [
+                    spe_id for spe_id in pathway.get_species_ids()
+                    if spe_id in sink_molecules
+                ]
             )
 
             nb_pathways += 1
@@ -792,10 +1004,15 @@ def __build_all_pathways(
             res_pathways[path_idx] = __keep_unique_pathways(
                 res_pathways[path_idx],
                 pathway,
+                signatures,
+                max_subpaths_filter,
                 logger
             )
 
-        nb_unique_pathways += len(res_pathways[path_idx])
+        nb_unique_pathways += sum(
+            len(_pathways)
+            for _pathways in signatures.values()
+        )
 
     # Flatten lists of pathways
     pathways = sum(
@@ -819,16 +1036,96 @@ def __build_all_pathways(
         for pathway in pathways
     ]
 
-    # Transform the list of Item into a list of Pathway
-    results = {}
-    nb_sel_pathways = 0
-    for res_pathway_idx, res_pathway in res_pathways.items():
-        results[res_pathway_idx] = [pathway.object for pathway in res_pathway]
-        nb_sel_pathways += len(results[res_pathway_idx])
 
-    logger.info(f'Pathways selected: {nb_sel_pathways}/{nb_pathways}')
+def __build_reaction_data(
+    transfo: Dict,
+    rule_ids: str,
+    tmpl_rxn_id: str,
+    rr_reactions: Dict,
+    compounds_cache: Dict,
+    logger: Logger = getLogger(__name__)
+) -> Dict:
+    """Builds data of the reaction defined by a
+    chemical transformation, a reaction rule and
+    a template reaction. Compounds added by the
+    template reaction and missing in the cache
+    are created.
+
+    Parameters
+    ----------
+    transfo: Dict
+        Full chemical transformation
+    rule_ids: str
+        Reaction rule ID
+    tmpl_rxn_id: str
+        Template reaction ID
+    rr_reactions: Dict
+        Reaction rules cache
+    compounds_cache: Dict
+        Compounds cache
+    logger: Logger, optional
+
+    Returns
+    -------
+    Reaction data ('compounds', 'target_id', 'ec',
+    'rule_score', 'trunk_species', 'completed_species')
+    """
 
-    return results
+    complement_entry = transfo['complement'][rule_ids][tmpl_rxn_id]
+    rr_entry = rr_reactions[rule_ids][tmpl_rxn_id]
+
+    ## COMPOUNDS
+    # Template reaction compounds
+    added_cmpds = complement_entry['added_cmpds']
+    # Add missing compounds to the cache
+    cached_objects = Cache.get_objects()
+    for side in added_cmpds.values():
+        for spe_id in side:
+            logger.debug(f'Add missing compound {spe_id}')
+            if spe_id not in cached_objects:
+                try:
+                    cmpd = compounds_cache[spe_id]
+                    rpCompound(
+                        id=spe_id,
+                        smiles=cmpd['smiles'],
+                        inchi=cmpd['inchi'],
+                        inchikey=cmpd['inchikey'],
+                        formula=cmpd['formula'],
+                        name=cmpd['name']
+                    )
+                except KeyError:
+                    rpCompound(
+                        id=spe_id
+                    )
+
+    # Compounds from original transformation
+    # (copied by __add_compounds)
+    core_species = {
+        side: transfo[side]
+        for side in __SIDES
+    }
+    compounds = __add_compounds(core_species, added_cmpds)
+
+    return {
+        'compounds': compounds,
+        # Search for the target in the reaction products
+        'target_id': next(
+            (
+                spe_id
+                for spe_id in compounds['right']
+                if 'TARGET' in spe_id
+            ),
+            None
+        ),
+        'ec': transfo['ec'],
+        'rule_score': rr_entry['rule_score'],
+        'trunk_species': list(
+            chain.from_iterable(core_species.values())
+        ),
+        'completed_species': list(
+            chain.from_iterable(added_cmpds.values())
+        )
+    }
 
 
 def __add_compounds(
@@ -843,7 +1140,8 @@ def __add_compounds(
     Parameters
     ----------
     compounds: Dict
-        Existing stoichiometric chemical compounds
+        Existing stoichiometric chemical compounds, each side
+        ('right', 'left') being a flat {spe_id: stoichio} dictionary
     compounds_to_add: Dict
         Stoichiometric chemical compounds to add
     logger: Logger, optional
@@ -853,25 +1151,26 @@ def __add_compounds(
     Merge of the two sets of compounds by differentiating
     if compounds have known structure or not.
     """
-    _compounds = deepcopy(compounds)
-    for side in ['right', 'left']:
-        # added compounds with struct
-        for cmpd_id, cmpd in compounds_to_add[side].items():
-            if cmpd_id in _compounds[side]:
-                _compounds[side][cmpd_id] += cmpd['stoichio']
-            else:
-                _compounds[side][cmpd_id] = cmpd['stoichio']
-        # added compounds with no struct
-        for cmpd_id, cmpd in compounds_to_add[side+'_nostruct'].items():
-            if cmpd_id in _compounds[side]:
-                _compounds[side][cmpd_id] += cmpd['stoichio']
-            else:
-                _compounds[side][cmpd_id] = cmpd['stoichio']
+    # Sides are flat dictionaries, a shallow copy
+    # is enough to leave 'compounds' untouched
+    _compounds = {
+        side: dict(compounds[side])
+        for side in __SIDES
+    }
+    for side in __SIDES:
+        _side = _compounds[side]
+        # added compounds with struct, then with no struct
+        for key in (side, side+'_nostruct'):
+            for cmpd_id, cmpd in compounds_to_add[key].items():
+                _side[cmpd_id] = _side.get(cmpd_id, 0) + cmpd['stoichio']
     return _compounds
 
+
 def __keep_unique_pathways(
     pathways: List[Dict],
     pathway: rpPathway,
+    signatures: Dict,
+    max_pathways: int = 0,
     logger: Logger = getLogger(__name__)
 ) -> List[Dict]:
     '''
@@ -885,6 +1184,14 @@ def __keep_unique_pathways(
         List of pathways sorted by increasing scores
     pathway: Dict
         Pathway to insert
+    signatures: Dict
+        Pathways of the list indexed by their signature
+        (see `__pathway_signature`), updated in place.
+        Pathways dropped from the list are kept here
+        so that their duplicates are still detected.
+    max_pathways: int, optional
+        Maximum number of pathways (best) kept in the list
+        (default: 0, no limit)
     logger : Logger, optional
         The logger object.
 
@@ -903,9 +1210,12 @@ def __keep_unique_pathways(
 
     # Detect if the predicted pathway is not already
     # in the list. If it is, then only add the template
-    # reaction id in the list of the duplicated reaction(s)
+    # reaction id in the list of the duplicated reaction(s).
+    # Equal pathways share the same signature, then only
+    # pathways with this signature are compared.
+    signature = __pathway_signature(pathway)
     pathway_found = False
-    for _pathway in pathways:
+    for _pathway in signatures.get(signature, []):
         if pathway == _pathway.object:
             pathway_found = True
             logger.debug(f'Equality between {_pathway.object.get_id()} and {pathway.get_id()}')
@@ -925,10 +1235,45 @@ def __keep_unique_pathways(
 
     if not pathway_found:
         score = pathway.get_mean_rule_score()
+        item = Item(pathway, score)
+        signatures.setdefault(signature, []).append(item)
+        # The list is full and the pathway is worse than all others
+        if 0 < max_pathways <= len(pathways) and item < pathways[0]:
+            return pathways
         # Insert pathway in best_pathways list by increasing score
         pathways = insert_and_or_replace_in_sorted_list(
-            Item(pathway, score),
+            item,
             pathways
         )
+        # Drop the worst pathway
+        if 0 < max_pathways < len(pathways):
+            pathways.pop(0)
 
     return pathways
+
+
+def __pathway_signature(
+    pathway: rpPathway
+) -> Tuple:
+    """Build a hashable signature of a pathway
+    from the stoichiometry of its reactions.
+    Two equal pathways have the same signature.
+
+    Parameters
+    ----------
+    pathway: rpPathway
+        Pathway to build the signature from
+
+    Returns
+    -------
+    Sorted tuple of (reactants, products) of each reaction
+    """
+    return tuple(
+        sorted(
+            (
+                tuple(sorted(rxn.get_reactants().items())),
+                tuple(sorted(rxn.get_products().items()))
+            )
+            for rxn in pathway.get_list_of_reactions()
+        )
+    )
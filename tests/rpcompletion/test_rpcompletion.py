@@ -6,8 +6,15 @@ Created on Jul 15 2020
 
 from tempfile             import TemporaryDirectory
 from rr_cache import rrCache
-from rptools.rplibs       import rpPathway
-from rptools.rpcompletion import rp_completion
+from rptools.rplibs       import (
+    rpPathway,
+    rpReaction,
+    rpCompound
+)
+from rptools.rpcompletion import (
+    rp_completion,
+    rpCompletion
+)
 # from rptools.rpcompletion.rpCompletion import (
 #     # build_side_rxn,
 #     # rp2paths_to_dict
@@ -21,12 +28,19 @@ from pathlib import Path
 from io                   import open  as io_open
 from json                 import load  as json_load
 from json                 import dumps as json_dumps
+from pickle               import dumps as pickle_dumps
+from multiprocessing      import get_start_method
 from unittest import TestCase
 from brs_utils import (
     create_logger,
 )
 
 
+# Private functions of rpCompletion module
+build_all_pathways = getattr(rpCompletion, '__build_all_pathways')
+keep_unique_pathways = getattr(rpCompletion, '__keep_unique_pathways')
+
+
 class Test_rpCompletion(TestCase):
 
     def setUp(self):
@@ -123,6 +137,32 @@ class Test_rpCompletion(TestCase):
             #     # self.assertEqual(os_stat(os_path.join(temp_d, file)).st_size, size)
          
 
+    def test_rp_completion_parallel(self):
+        # Unless workers are forked, an unpicklable
+        # cache would silently fall back to serial mode
+        if get_start_method() != 'fork':
+            pickle_dumps(self.cache)
+        args = {
+            'rp2_metnet': self.rp2_pathways,
+            'sink': self.sink,
+            'rp2paths_compounds': self.rp2paths_compounds,
+            'rp2paths_pathways': self.rp2paths_pathways,
+            'cache': self.cache,
+            'upper_flux_bound': 999999,
+            'lower_flux_bound': 0,
+            'max_subpaths_filter': 10,
+            'logger': self.logger
+        }
+        serial = rp_completion(nb_workers=1, **args)
+        parallel = rp_completion(nb_workers=2, **args)
+        self.assertEqual(
+            [pathway.get_id() for pathway in parallel],
+            [pathway.get_id() for pathway in serial]
+        )
+        for pathway, ref_pathway in zip(parallel, serial):
+            self.assertEqual(pathway, ref_pathway)
+
+
     # def test_update_rppaths(self):
     #     path_base_id = 2
     #     path_step = 3
@@ -193,4 +233,189 @@ class Test_rpCompletion(TestCase):
     #                 self.cache.get('rr_reactions'), self.cache.get('deprecatedCID_cid')
     #             ),
     #             data
-    #         )
\ No newline at end of file
+    #         )
+
+
+class Test_keep_unique_pathways(TestCase):
+
+    def setUp(self):
+        self.logger = create_logger(__name__, 'ERROR')
+        self.target_id = 'TARGET_0000000001'
+        for spe_id in [
+            self.target_id,
+            'CMPD_0000000001',
+            'CMPD_0000000002',
+            'CMPD_0000000003',
+            'MNXM2'
+        ]:
+            rpCompound(id=spe_id)
+
+    def _pathway(self, id, reactant_id, score, tmpl_rxn_id):
+        # One-reaction pathway producing the target
+        rxn = rpReaction(
+            id='rxn_1',
+            reactants={reactant_id: 1},
+            products={self.target_id: 1}
+        )
+        rxn.set_rule_ids(['RR_1'])
+        rxn.set_tmpl_rxn_ids([tmpl_rxn_id])
+        rxn.set_rule_score(score)
+        pathway = rpPathway(id=id, logger=self.logger)
+        pathway.add_reaction(rxn=rxn, target_id=self.target_id)
+        return pathway
+
+    def _keep(self, pathways, max_pathways):
+        kept = []
+        signatures = {}
+        for pathway in pathways:
+            kept = keep_unique_pathways(
+                kept,
+                pathway,
+                signatures,
+                max_pathways,
+                self.logger
+            )
+        return [item.object.get_id() for item in kept]
+
+    def test_max_pathways(self):
+        pathways = [
+            self._pathway('p1', 'CMPD_0000000001', 0.1, 'MNXR1'),
+            self._pathway('p2', 'CMPD_0000000002', 0.5, 'MNXR2'),
+            self._pathway('p3', 'CMPD_0000000003', 0.9, 'MNXR3')
+        ]
+        self.assertEqual(
+            self._keep(pathways, 2),
+            ['p2', 'p3']
+        )
+
+    def test_no_limit(self):
+        pathways = [
+            self._pathway('p3', 'CMPD_0000000003', 0.9, 'MNXR3'),
+            self._pathway('p1', 'CMPD_0000000001', 0.1, 'MNXR1'),
+            self._pathway('p2', 'CMPD_0000000002', 0.5, 'MNXR2')
+        ]
+        self.assertEqual(
+            self._keep(pathways, 0),
+            ['p1', 'p2', 'p3']
+        )
+
+    def test_duplicate_of_dropped_pathway(self):
+        dropped = self._pathway('p1', 'CMPD_0000000001', 0.5, 'MNXR1')
+        pathways = [
+            dropped,
+            self._pathway('p2', 'CMPD_0000000002', 0.9, 'MNXR2'),
+            # Same reaction as the dropped pathway, better score
+            self._pathway('p3', 'CMPD_0000000001', 0.95, 'MNXR3')
+        ]
+        # The duplicate is merged into the first occurrence,
+        # which has been dropped, and is not inserted again
+        self.assertEqual(
+            self._keep(pathways, 1),
+            ['p2']
+        )
+        self.assertEqual(
+            dropped.get_list_of_reactions()[0].get_tmpl_rxn_ids(),
+            ['MNXR1', 'MNXR3']
+        )
+
+
+class Test_build_all_pathways(TestCase):
+
+    def setUp(self):
+        self.logger = create_logger(__name__, 'ERROR')
+        self.target_id = 'TARGET_0000000001'
+        for spe_id in [
+            self.target_id,
+            'CMPD_0000000001',
+            'CMPD_0000000002',
+            'MNXM2'
+        ]:
+            rpCompound(id=spe_id)
+
+    def test_bound_per_master_pathway(self):
+        # Non-regression check: the expected IDs are the same
+        # whether sub-pathways are bounded per master pathway or
+        # only once all of them are built, this does not check
+        # the bound itself
+        no_cmpds = {
+            'right': {},
+            'left': {},
+            'right_nostruct': {},
+            'left_nostruct': {}
+        }
+        def added_cmpds(stoichio):
+            return {
+                **no_cmpds,
+                'right': {'MNXM2': {'stoichio': stoichio}}
+            }
+        transfos = {
+            'TRS_0_1_1': {
+                'ec': [],
+                'left': {'CMPD_0000000001': 1},
+                'right': {self.target_id: 1},
+                'complement': {
+                    'RR_1': {
+                        f'MNXR{i}': {'added_cmpds': added_cmpds(i)}
+                        for i in range(1, 4)
+                    }
+                }
+            },
+            'TRS_0_2_1': {
+                'ec': [],
+                'left': {'CMPD_0000000002': 1},
+                'right': {self.target_id: 1},
+                'complement': {
+                    'RR_2': {'MNXR4': {'added_cmpds': no_cmpds}}
+                }
+            }
+        }
+        rr_reactions = {
+            'RR_1': {
+                'MNXR1': {'rule_score': 0.9},
+                'MNXR2': {'rule_score': 0.8},
+                'MNXR3': {'rule_score': 0.7}
+            },
+            'RR_2': {
+                'MNXR4': {'rule_score': 0.1}
+            }
+        }
+        # Master pathway 1 has three sub-pathways, 2 has one
+        pathways = {
+            1: [[
+                {
+                    'rp2_transfo_id': 'TRS_0_1_1',
+                    'rule_ids': 'RR_1',
+                    'tmpl_rxn_ids': tmpl_rxn_id
+                }
+                for tmpl_rxn_id in rr_reactions['RR_1']
+            ]],
+            2: [[
+                {
+                    'rp2_transfo_id': 'TRS_0_2_1',
+                    'rule_ids': 'RR_2',
+                    'tmpl_rxn_ids': 'MNXR4'
+                }
+            ]]
+        }
+        for max_subpaths_filter, ref_ids in [
+            # Best sub-pathways of master pathway 1 are kept
+            (2, ['001_0002', '001_0001']),
+            # No limit
+            (0, ['002_0001', '001_0003', '001_0002', '001_0001'])
+        ]:
+            with self.subTest(max_subpaths_filter=max_subpaths_filter):
+                res = build_all_pathways(
+                    pathways=pathways,
+                    transfos=transfos,
+                    sink_molecules=frozenset(),
+                    rr_reactions=rr_reactions,
+                    compounds_cache={},
+                    max_subpaths_filter=max_subpaths_filter,
+                    lower_flux_bound=0,
+                    upper_flux_bound=999999,
+                    logger=self.logger
+                )
+                self.assertEqual(
+                    [pathway.get_id() for pathway in res],
+                    ref_ids
+                )
@@ -13,18 +13,46 @@ from rr_cache import rrCache
 
 # Specific for tests themselves
 from pathlib  import Path
-from tempfile import NamedTemporaryFile
-from filecmp  import cmp
+from tempfile import (
+    TemporaryDirectory,
+    mkstemp
+)
 from os import (
-    path as os_path,
-    remove
+    close,
+    truncate
+)
+from logging import (
+    getLogger,
+    NullHandler,
+    CRITICAL
 )
-from brs_utils import (
-    create_logger,
-    extract_gz
+from gzip      import open as gz_open
+from shutil    import copyfileobj
+from functools import lru_cache
+from hashlib   import sha256
+from mmap      import (
+    mmap,
+    ACCESS_READ
 )
-from shutil    import rmtree
-from tempfile  import mkdtemp
+
+
+# SHA-256 digests of reference outputs
+# (references are only read to report a mismatch)
+REF_DIGESTS = {
+    'output_sink.csv': bytes.fromhex(
+        '1f5f7be90e2f143c3699f4c1dac0f37a6aed8b9f94bdb67898f1272962d6bf17'
+    ),
+    'output_sink_woDE.csv': bytes.fromhex(
+        '45a73da1608eef5496501b5ae2f6faee1a7e5f0d4f16b16c5f4e3f5c9e6bae19'
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _get_cache(attrs):
+    # Loading cache attributes is expensive,
+    # share one rrCache per set of attributes
+    return rrCache(list(attrs))
 
 
 # Cette classe est un groupe de tests. Son nom DOIT commencer
@@ -33,85 +61,101 @@ from tempfile  import mkdtemp
 class Test_rpExtractSink(TestCase):
 
 
-    data_path = os_path.join(
-        os_path.dirname(__file__),
-        'data'
-    )
-    e_coli_model_path_gz = os_path.join(
-        data_path,
-        'e_coli_model.sbml.gz'
-    )
+    data_path = Path(__file__).parent / 'data'
+    e_coli_model_path_gz = str(data_path / 'e_coli_model.sbml.gz')
+    # Chunk size used to deflate the model
+    gz_chunk_size = 128 * 1024
+    # genSink() only writes to a path, keep
+    # its output in RAM when tmpfs is available
+    out_d = '/dev/shm' if Path('/dev/shm').is_dir() else None
 
-    cache = rrCache(
-        ['cid_strc']
+    cache = _get_cache(
+        ('cid_strc',)
     )
 
 
-    def setUp(self):
-        self.logger = create_logger(__name__, 'ERROR')
-
-        # Create persistent temp folder
-        # to deflate compressed data file so that
-        # it remains reachable outside of this method.
-        # Has to remove manually it in tearDown() method 
-        self.temp_d = mkdtemp()
-
-        self.e_coli_model_path = extract_gz(
-            self.e_coli_model_path_gz,
-            self.temp_d
+    @classmethod
+    def setUpClass(cls):
+        # Silent logger, level checks
+        # short-circuit every log call
+        cls.logger = getLogger(__name__)
+        cls.logger.addHandler(NullHandler())
+        cls.logger.setLevel(CRITICAL + 1)
+        cls.logger.propagate = False
+
+        # Create temp folder shared by all tests
+        # of the class to store the deflated model and outputs.
+        # Removed by class cleanup, even if setUpClass() fails.
+        # Each process running this class (e.g. a pytest-xdist
+        # worker) gets its own folder, nothing is shared
+        cls._tmp = TemporaryDirectory(dir=cls.out_d)
+        cls.addClassCleanup(cls._tmp.cleanup)
+        cls.temp_d = cls._tmp.name
+
+        # Deflate the model once for all tests, rpSBML
+        # would otherwise extract the gz on every genSink() call
+        cls.e_coli_model_path = str(Path(cls.temp_d, 'e_coli_model.sbml'))
+        with gz_open(cls.e_coli_model_path_gz, 'rb') as f_in, \
+             open(cls.e_coli_model_path, 'wb') as f_out:
+            copyfileobj(f_in, f_out, cls.gz_chunk_size)
+
+        # Output file reused by all tests
+        # (emptied before each genSink() call)
+        fd, cls.outfile = mkstemp(
+            suffix='.csv',
+            dir=cls.temp_d
         )
-
-
-    def tearDown(self):
-        rmtree(self.temp_d)
-
-
-    def test_genSink(self):
-        outfile = NamedTemporaryFile(delete=False)
-        outfile.close()
+        close(fd)
+
+
+    def assertSinkEqual(self, path, ref_name):
+        # Hash the mapped file, without copying it in memory
+        # (an empty file cannot be mapped). Reference digests
+        # are computed with LF line endings, CRLF ones (written
+        # on Windows) are converted, which needs a copy.
+        with open(path, 'rb') as f:
+            if Path(path).stat().st_size == 0:
+                digest = sha256().digest()
+            else:
+                with mmap(f.fileno(), 0, access=ACCESS_READ) as m:
+                    if m.find(b'\r\n') == -1:
+                        digest = sha256(m).digest()
+                    else:
+                        digest = sha256(
+                            m[:].replace(b'\r\n', b'\n')
+                        ).digest()
+        # The digest is a fast path only, on mismatch
+        # the full comparison decides (and gives a diff).
+        # Text mode makes it line endings insensitive
+        if digest != REF_DIGESTS[ref_name]:
+            self.assertEqual(
+                Path(path).read_text(encoding='utf-8'),
+                (self.data_path / ref_name).read_text(encoding='utf-8')
+            )
+
+
+    def _check_case(self, remove_dead_end, ref_name):
+        # genSink() may not write anything on failure,
+        # do not leave the previous output behind
+        truncate(self.outfile, 0)
         genSink(
             self.cache,
             input_sbml = self.e_coli_model_path,
-            output_sink = outfile.name,
-            remove_dead_end = False,
+            output_sink = self.outfile,
+            remove_dead_end = remove_dead_end,
             compartment_id = 'MNXC3',
             logger = self.logger
         )
-        outfile.close()
-        with open(outfile.name, 'r') as test_f:
-            test_content = test_f.read()
-            with open(
-                os_path.join(
-                    self.data_path,
-                    'output_sink.csv'
-                ),
-                'r'
-            ) as ref_f:
-                ref_content = ref_f.read()
-                self.assertEqual(test_content, ref_content)
-        remove(outfile.name)
+        self.assertSinkEqual(
+            self.outfile,
+            ref_name
+        )
+
+
+    # One test per case, so that they can run in separate workers
+    def test_genSink(self):
+        self._check_case(False, 'output_sink.csv')
 
 
     def test_genSink_rmDE(self):
-        outfile = NamedTemporaryFile(delete=False)
-        outfile.close()
-        genSink(
-            self.cache,
-            input_sbml = self.e_coli_model_path,
-            output_sink = outfile.name,
-            remove_dead_end = True,
-            compartment_id = 'MNXC3'
-        )
-        outfile.close()
-        with open(outfile.name, 'r') as test_f:
-            test_content = test_f.read()
-            with open(
-                os_path.join(
-                    self.data_path,
-                    'output_sink_woDE.csv'
-                ),
-                'r'
-            ) as ref_f:
-                ref_content = ref_f.read()
-                self.assertEqual(test_content, ref_content)
-        remove(outfile.name)
+        self._check_case(True, 'output_sink_woDE.csv')